@@ -17,8 +17,13 @@ from homeassistant.core import (
 )
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
 
-from .client.dh_lottery_client import DhLotteryClient, DhLotteryError
+from .client.dh_lottery_client import (
+    DhLotteryClient,
+    DhLotteryError,
+    DH_LOTTERY_HEADERS,
+)
 from .client.dh_lotto_645 import DhLotto645SelMode, DhLotto645
 from .const import (
     DOMAIN,
@@ -34,7 +39,7 @@ _LOGGER = logging.getLogger(__name__)
 type DhLotteryConfigEntry = ConfigEntry[DhLotteryData]  # noqa: F821
 
 
-@dataclass
+@dataclass(slots=True)
 class DhLotteryData:
     """DH Lottery data class."""
 
@@ -59,7 +64,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: DhLotteryConfigEntry) ->
     hass.data.setdefault(DOMAIN, {})
     username = entry.data[CONF_USERNAME]
     password = entry.data[CONF_PASSWORD]
-    client = DhLotteryClient(username, password)
+    # 로그인 쿠키가 계정별로 분리되도록 항목마다 세션을 만들되,
+    # 생명 주기는 Home Assistant가 관리하도록 합니다.
+    session = async_create_clientsession(
+        hass, verify_ssl=False, headers=DH_LOTTERY_HEADERS
+    )
+    client = DhLotteryClient(username, password, session=session)
     try:
         await client.async_login()
     except DhLotteryError as ex:
@@ -102,14 +112,21 @@ async def _async_setup_service(
             if lottery_data.lotto_645_coord:
                 await lottery_data.lotto_645_coord.async_clear_refresh()
 
+    # 서비스 호출마다 레지스트리를 조회하지 않도록 엔티티 ID -> 설정 항목 ID를 기억합니다.
+    entity_entry_ids: dict[str, str] = {}
+
     def _find_lottery_data(deposit_id: str) -> DhLotteryData:
-        registry = er.async_get(hass)
-        registry_entry = registry.async_get(deposit_id)
-        if not registry_entry:
-            raise ValueError(f"예치금 엔티티 '{deposit_id}'를 찾을 수 없습니다.")
-        if registry_entry.config_entry_id not in hass.data[DOMAIN]:
-            raise ValueError(f"예치금 엔티티 '{deposit_id}'를 찾을 수 없습니다.")
-        return hass.data[DOMAIN][registry_entry.config_entry_id]
+        entry_id = entity_entry_ids.get(deposit_id)
+        if entry_id is None or entry_id not in hass.data[DOMAIN]:
+            registry = er.async_get(hass)
+            registry_entry = registry.async_get(deposit_id)
+            if not registry_entry:
+                raise ValueError(f"예치금 엔티티 '{deposit_id}'를 찾을 수 없습니다.")
+            if registry_entry.config_entry_id not in hass.data[DOMAIN]:
+                raise ValueError(f"예치금 엔티티 '{deposit_id}'를 찾을 수 없습니다.")
+            entry_id = registry_entry.config_entry_id
+            entity_entry_ids[deposit_id] = entry_id
+        return hass.data[DOMAIN][entry_id]
 
     async def _async_buy_lotto_645(call: ServiceCall) -> ServiceResponse:
         """로또 6/45를 구매합니다."""
@@ -117,22 +134,23 @@ async def _async_setup_service(
         try:
             lottery_data = _find_lottery_data(call.data["entity_id"])
             items: List[DhLotto645.Slot] = []
-            for i in range(1, 6):
-                if f"game_{i}" in call.data:
-                    texts = call.data[f"game_{i}"].strip().split(",")
-                    sel_mode = DhLotto645SelMode(texts[0])
-                    if sel_mode == DhLotto645SelMode.AUTO:
-                        items.append(DhLotto645.Slot(DhLotto645SelMode.AUTO))
-                    else:
-                        items.append(
-                            DhLotto645.Slot(sel_mode, [int(text) for text in texts[1:]])
-                        )
+            for game in (
+                call.data[key]
+                for key in ("game_1", "game_2", "game_3", "game_4", "game_5")
+                if key in call.data
+            ):
+                texts = game.strip().split(",")
+                sel_mode = DhLotto645SelMode(texts[0])
+                if sel_mode == DhLotto645SelMode.AUTO:
+                    items.append(DhLotto645.Slot(DhLotto645SelMode.AUTO))
+                else:
+                    items.append(
+                        DhLotto645.Slot(sel_mode, [int(text) for text in texts[1:]])
+                    )
             result = await lottery_data.lotto_645_coord.lotto_645.async_buy(items)
             number_text = "\n".join(
-                [
-                    f"- {game.slot} {game.mode} {' '.join(map(str, game.numbers))}"
-                    for game in result.games
-                ]
+                f"- {game.slot} {game.mode} {' '.join(map(str, game.numbers))}"
+                for game in result.games
             )
             message = f"제 {result.round_no}회\n발행일: {result.issue_dt}\n바코드: {result.barcode}\n번호:\n{number_text}"
             persistent_notification.async_create(
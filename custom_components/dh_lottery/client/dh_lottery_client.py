@@ -1,7 +1,10 @@
+import asyncio
 import datetime
+import functools
 import logging
-import threading
+import time
 from dataclasses import dataclass
+from typing import Any
 
 
 import aiohttp
@@ -11,8 +14,35 @@ _LOGGER = logging.getLogger(__name__)
 
 DH_LOTTERY_URL = "https://dhlottery.co.kr"
 
+# 예치금 조회 결과 캐시 유지 시간 (초)
+BALANCE_CACHE_TTL = 15.0
 
-@dataclass
+# 구매내역 조회 결과 캐시 유지 시간 (초)
+BUY_LIST_CACHE_TTL = 30.0
+
+DH_LOTTERY_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/91.0.4472.77 Safari/537.36",
+    "Connection": "keep-alive",
+    "Cache-Control": "max-age=0",
+    "sec-ch-ua": '" Not;A Brand";v="99", "Google Chrome";v="91", "Chromium";v="91"',
+    "sec-ch-ua-mobile": "?0",
+    "Upgrade-Insecure-Requests": "1",
+    "Origin": DH_LOTTERY_URL,
+    "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,"
+    "*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
+    "Referer": DH_LOTTERY_URL,
+    "Sec-Fetch-Site": "same-site",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-User": "?1",
+    "Sec-Fetch-Dest": "document",
+    "Accept-Language": "ko,en-US;q=0.9,en;q=0.8,ko-KR;q=0.7",
+    "X-Requested-With": "XMLHttpRequest",
+}
+
+
+@dataclass(slots=True)
 class DhLotteryBalanceData:
     deposit: int = 0  # 총예치금
     purchase_available: int = 0  # 구매가능금액
@@ -30,147 +60,235 @@ class DhLotteryLoginError(DhLotteryError):
     """로그인에 실패했을 때 발생하는 예외입니다."""
 
 
+async def async_parse_html(text: str) -> BeautifulSoup:
+    """HTML을 BeautifulSoup으로 파싱합니다.
+
+    html5lib 파싱은 페이지당 수십 ms씩 CPU를 점유하므로 이벤트 루프를
+    막지 않도록 실행기 스레드에서 수행합니다.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        None, BeautifulSoup, text, "html5lib"
+    )
+
+
+def _wrap_errors(message: str):
+    """실패 시 message를 담은 DhLotteryError로 감싸는 데코레이터입니다.
+
+    DhLotteryError 계열 예외는 그대로 전달합니다.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except DhLotteryError:
+                raise
+            except Exception as ex:
+                raise DhLotteryError(message) from ex
+
+        return wrapper
+
+    return decorator
+
+
 class DhLotteryClient:
     """동행복권 클라이언트 클래스입니다."""
 
-    def __init__(self, username: str, password: str):
-        """DhLotteryClient 클래스를 초기화합니다."""
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        session: aiohttp.ClientSession | None = None,
+    ):
+        """DhLotteryClient 클래스를 초기화합니다.
+
+        session을 넘기면(예: Home Assistant가 관리하는 세션) 그 세션을
+        사용하고, 없으면 자체 세션을 생성합니다. 로그인 쿠키가 세션에
+        저장되므로 계정마다 별도의 세션을 사용해야 합니다.
+        """
         self.username = username
         self._password = password
-        self.session = aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(ssl=False),
-            headers={
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/91.0.4472.77 Safari/537.36",
-                "Connection": "keep-alive",
-                "Cache-Control": "max-age=0",
-                "sec-ch-ua": '" Not;A Brand";v="99", "Google Chrome";v="91", "Chromium";v="91"',
-                "sec-ch-ua-mobile": "?0",
-                "Upgrade-Insecure-Requests": "1",
-                "Origin": DH_LOTTERY_URL,
-                "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,"
-                "*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
-                "Referer": DH_LOTTERY_URL,
-                "Sec-Fetch-Site": "same-site",
-                "Sec-Fetch-Mode": "navigate",
-                "Sec-Fetch-User": "?1",
-                "Sec-Fetch-Dest": "document",
-                "Accept-Language": "ko,en-US;q=0.9,en;q=0.8,ko-KR;q=0.7",
-                "X-Requested-With": "XMLHttpRequest",
-            },
+        self.session = session or aiohttp.ClientSession(
+            # 모든 요청이 dhlottery.co.kr 한 호스트로 향하므로 풀을 작게
+            # 잡고, 갱신 주기 사이에 TLS/TCP 핸드셰이크가 반복되지 않도록
+            # keep-alive 유지 시간을 넉넉히 둡니다.
+            connector=aiohttp.TCPConnector(
+                ssl=False,
+                limit=10,
+                limit_per_host=4,
+                keepalive_timeout=75,
+                ttl_dns_cache=300,
+            ),
+            headers=DH_LOTTERY_HEADERS,
         )
-        self.lock = threading.RLock()
+        self.lock = asyncio.Lock()
         self.logged_in = False
+        self._last_login_at: float = 0.0
+        self._cache: dict[str, tuple[float, Any]] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
 
     async def async_get_with_login(
         self,
         path: str,
         retry: int = 1,
     ) -> BeautifulSoup:
-        """로그인이 필요한 페이지를 가져옵니다."""
-        with self.lock:
-            try:
-                resp = await self.session.get(url=f"{DH_LOTTERY_URL}/{path}")
-                soup = BeautifulSoup(await resp.text(), "html5lib")
-                if not soup.find("a", {"class": "btn_common"}, string="로그아웃"):
-                    _LOGGER.debug("required login. retry: %d", retry)
-                    if retry > 0:
-                        await self.async_login()
-                        return await self.async_get_with_login(path, retry - 1)
-                    raise DhLotteryLoginError(
-                        "❗로그인에 실패했습니다. 세션 상태를 확인해주세요."
-                    )
+        """로그인이 필요한 페이지를 가져옵니다.
+
+        같은 경로에 대한 요청이 이미 진행 중이면 새 요청을 보내지 않고
+        그 결과를 함께 기다립니다.
+        """
+        task = self._inflight.get(path)
+        if task is None:
+            task = asyncio.create_task(self._async_get_with_login(path, retry))
+            self._inflight[path] = task
+            task.add_done_callback(lambda _task: self._inflight.pop(path, None))
+        return await task
+
+    @_wrap_errors("❗로그인이 필요한 페이지를 가져오지 못했습니다.")
+    async def _async_get_with_login(
+        self,
+        path: str,
+        retry: int = 1,
+    ) -> BeautifulSoup:
+        """로그인이 필요한 페이지를 실제로 가져옵니다."""
+        for attempt in range(retry + 1):
+            resp = await self.session.get(url=f"{DH_LOTTERY_URL}/{path}")
+            soup = await async_parse_html(await resp.text())
+            if soup.find("a", {"class": "btn_common"}, string="로그아웃"):
                 return soup
-            except DhLotteryError:
-                raise
-            except Exception as ex:
-                raise DhLotteryError(
-                    "❗로그인이 필요한 페이지를 가져오지 못했습니다."
-                ) from ex
+            _LOGGER.debug("required login. retry: %d", retry - attempt)
+            if attempt < retry:
+                await self._async_relogin()
+        raise DhLotteryLoginError("❗로그인에 실패했습니다. 세션 상태를 확인해주세요.")
+
+    async def _async_relogin(self) -> None:
+        """세션이 만료됐을 때 재로그인합니다.
+
+        동시에 여러 요청이 실패해도 로그인은 한 번만 수행되도록
+        락을 획득한 뒤 이미 다른 요청이 로그인했는지 확인합니다.
+        """
+        started = time.monotonic()
+        async with self.lock:
+            if self._last_login_at < started:
+                await self.async_login()
 
+    @_wrap_errors("❗로그인을 수행하지 못했습니다.")
     async def async_login(self):
         """로그인을 수행합니다."""
-        _LOGGER.info("login")
-        try:
-            resp = await self.session.post(
-                url=f"{DH_LOTTERY_URL}/userSsl.do?method=login",
-                data={
-                    "returnUrl": f"{DH_LOTTERY_URL}/common.do?method=main",
-                    "userId": self.username,
-                    "password": self._password,
-                    "checkSave": "off",
-                    "newsEventYn": "",
-                },
-            )
-            soup = BeautifulSoup(await resp.text(), "html5lib")
-            if soup.title and "점검" in soup.title.text:
-                self.logged_in = False
-                raise DhLotteryLoginError(
-                    "시스템 점검중 입니다. 잠시 후 다시 시도해주세요."
-                )
-            if soup.find("a", attrs={"class": "btn_common"}):
-                self.logged_in = False
-                raise DhLotteryLoginError(
-                    "로그인에 실패했습니다. 아이디 또는 비밀번호를 확인해주세요. (5회 실패했을 수도 있습니다. 이 경우엔 홈페이지에서 비밀번호를 변경해야 합니다)"
-                )
+        _LOGGER.debug("login")
+        resp = await self.session.post(
+            url=f"{DH_LOTTERY_URL}/userSsl.do?method=login",
+            data={
+                "returnUrl": f"{DH_LOTTERY_URL}/common.do?method=main",
+                "userId": self.username,
+                "password": self._password,
+                "checkSave": "off",
+                "newsEventYn": "",
+            },
+        )
+        # 로그인에 성공하면 loginSuccess.do로 이동하므로 URL 경로만으로
+        # HTML 파싱 없이 성공을 판정할 수 있습니다.
+        if resp.status == 200 and resp.url.path.endswith("/loginSuccess.do"):
+            # 본문은 필요 없으므로 읽지 않고 연결을 풀에 돌려줍니다.
+            resp.release()
             self.logged_in = True
-        except DhLotteryError:
-            raise
-        except Exception as ex:
-            raise DhLotteryError("❗로그인을 수행하지 못했습니다.") from ex
+            self._last_login_at = time.monotonic()
+            return
+        soup = await async_parse_html(await resp.text())
+        if soup.title and "점검" in soup.title.text:
+            self.logged_in = False
+            raise DhLotteryLoginError("시스템 점검중 입니다. 잠시 후 다시 시도해주세요.")
+        if soup.find("a", attrs={"class": "btn_common"}):
+            self.logged_in = False
+            raise DhLotteryLoginError(
+                "로그인에 실패했습니다. 아이디 또는 비밀번호를 확인해주세요. (5회 실패했을 수도 있습니다. 이 경우엔 홈페이지에서 비밀번호를 변경해야 합니다)"
+            )
+        self.logged_in = True
+        self._last_login_at = time.monotonic()
+
+    def _cache_get(self, key: str, ttl: float) -> Any:
+        """TTL이 지나지 않은 캐시 값을 반환합니다. 없으면 None을 반환합니다."""
+        cached = self._cache.get(key)
+        if cached and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+        return None
+
+    def _cache_set(self, key: str, value: Any) -> None:
+        """조회 결과를 캐시에 저장합니다."""
+        self._cache[key] = (time.monotonic(), value)
 
+    def clear_cache(self) -> None:
+        """구매 등으로 서버 상태가 바뀐 뒤 호출하여 조회 캐시를 비웁니다."""
+        self._cache.clear()
+
+    @_wrap_errors("❗예치금 현황을 조회하지 못했습니다.")
     async def async_get_balance(self) -> DhLotteryBalanceData:
         """예치금 현황을 조회합니다."""
-        try:
-            soup = await self.async_get_with_login("userSsl.do?method=myPage")
-            elem = soup.select("div.box.money")[0]
-
-            td_ta_right = elem.select(".tbl_total_account_number tbody td.ta_right")
-            # 간편충전 계좌번호가 없는 경우
-            return DhLotteryBalanceData(
-                deposit=self.parse_digit(
-                    elem.select("p.total_new > strong")[0].text.strip()
-                ),
-                purchase_available=self.parse_digit(td_ta_right[0].text.strip()),
-                reservation_purchase=self.parse_digit(td_ta_right[1].text.strip()),
-                withdrawal_request=self.parse_digit(td_ta_right[2].text.strip()),
-                purchase_impossible=self.parse_digit(td_ta_right[3].text.strip()),
-                this_month_accumulated_purchase=self.parse_digit(
-                    td_ta_right[4].text.strip()
-                ),
-            )
-        except Exception as ex:
-            raise DhLotteryError("❗예치금 현황을 조회하지 못했습니다.") from ex
+        if (cached := self._cache_get("balance", BALANCE_CACHE_TTL)) is not None:
+            return cached
+        soup = await self.async_get_with_login("userSsl.do?method=myPage")
+        elem = soup.select("div.box.money")[0]
 
+        td_ta_right = elem.select(".tbl_total_account_number tbody td.ta_right")
+        # 간편충전 계좌번호가 없는 경우
+        balance = DhLotteryBalanceData(
+            deposit=self.parse_digit(
+                elem.select("p.total_new > strong")[0].text.strip()
+            ),
+            purchase_available=self.parse_digit(td_ta_right[0].text.strip()),
+            reservation_purchase=self.parse_digit(td_ta_right[1].text.strip()),
+            withdrawal_request=self.parse_digit(td_ta_right[2].text.strip()),
+            purchase_impossible=self.parse_digit(td_ta_right[3].text.strip()),
+            this_month_accumulated_purchase=self.parse_digit(
+                td_ta_right[4].text.strip()
+            ),
+        )
+        self._cache_set("balance", balance)
+        return balance
+
+    @staticmethod
+    def _buy_list_data(
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+        lotto_id: str,
+        win_grade: str,
+        now_page: int = 1,
+    ) -> dict[str, str]:
+        """구매내역 조회(lottoBuyList) 요청 본문을 생성합니다."""
+        return {
+            "nowPage": str(now_page),
+            "searchStartDate": start_date.strftime("%Y%m%d"),
+            "searchEndDate": end_date.strftime("%Y%m%d"),
+            "lottoId": lotto_id,
+            "winGrade": win_grade,
+            "calendarStartDt": start_date.strftime("%Y-%m-%d"),
+            "calendarEndDt": end_date.strftime("%Y-%m-%d"),
+            "sortOrder": "DESC",
+        }
+
+    @_wrap_errors("❗최근 1주일간의 구매내역을 조회하지 못했습니다.")
     async def async_get_buy_list(self, lotto_id: str) -> list[Tag]:
         """1주일간의 구매내역을 조회합니다."""
+        cache_key = f"buy_list_{lotto_id}"
+        if (cached := self._cache_get(cache_key, BUY_LIST_CACHE_TTL)) is not None:
+            return cached
         end_date = datetime.datetime.now()
         start_date = end_date - datetime.timedelta(days=7)
         await self.async_get_with_login("myPage.do?method=lottoBuyListView")
-        try:
-            resp = await self.session.post(
-                f"{DH_LOTTERY_URL}/myPage.do?method=lottoBuyList",
-                data={
-                    "nowPage": "1",
-                    "searchStartDate": start_date.strftime("%Y%m%d"),
-                    "searchEndDate": end_date.strftime("%Y%m%d"),
-                    "lottoId": lotto_id,
-                    "winGrade": "2",
-                    "calendarStartDt": start_date.strftime("%Y-%m-%d"),
-                    "calendarEndDt": end_date.strftime("%Y-%m-%d"),
-                    "sortOrder": "DESC",
-                },
-            )
-            soup = BeautifulSoup(await resp.text(), "html5lib")
-            if soup.find("td", {"class": "nodata"}):
-                return []
-            return soup.select("table.tbl_data_col tbody tr")
-        except Exception as ex:
-            raise DhLotteryError(
-                "❗최근 1주일간의 구매내역을 조회하지 못했습니다."
-            ) from ex
+        resp = await self.session.post(
+            f"{DH_LOTTERY_URL}/myPage.do?method=lottoBuyList",
+            data=self._buy_list_data(start_date, end_date, lotto_id, "2"),
+        )
+        soup = await async_parse_html(await resp.text())
+        if soup.find("td", {"class": "nodata"}):
+            buy_list: list[Tag] = []
+        else:
+            buy_list = soup.select("table.tbl_data_col tbody tr")
+        self._cache_set(cache_key, buy_list)
+        return buy_list
 
+    @_wrap_errors("❗지급기한이 종료되지 않은 당첨금을 조회하지 못하였습니다..")
     async def async_get_accumulated_prize(self) -> int:
         """지급기한이 종료되지 않은 당첨금 누적금액을 조회합니다. 기간 1년"""
 
@@ -180,47 +298,37 @@ class DhLotteryClient:
         now_page: int = 1
         accum_prize: int = 0
         last_table: str | None = None
-        try:
-            while True:
-                resp = await self.session.post(
-                    f"{DH_LOTTERY_URL}/myPage.do?method=lottoBuyList",
-                    data={
-                        "nowPage": str(now_page),
-                        "searchStartDate": start_date.strftime("%Y%m%d"),
-                        "searchEndDate": end_date.strftime("%Y%m%d"),
-                        "lottoId": "",
-                        "winGrade": "1",
-                        "calendarStartDt": start_date.strftime("%Y-%m-%d"),
-                        "calendarEndDt": end_date.strftime("%Y-%m-%d"),
-                        "sortOrder": "DESC",
-                    },
-                )
-                soup = BeautifulSoup(await resp.text(), "html5lib")
-                table = soup.find("table", {"class": "tbl_data_col"})
-                if not table or table.text == last_table:
-                    return accum_prize
-                last_table = table.text
-
-                if table.find("td", {"class": "nodata"}):
-                    return accum_prize
-
-                trs = table.select("tbody tr")
-                for tr in trs:
-                    tds = tr.select("td")
-                    if tds[5].text.strip() != "당첨":
-                        return accum_prize
-
-                    accum_prize += DhLotteryClient.parse_digit(tds[6].text.strip())
-                if len(trs) < 10:
-                    return accum_prize
-                now_page += 1
-        except Exception as ex:
-            raise DhLotteryError(
-                "❗지급기한이 종료되지 않은 당첨금을 조회하지 못하였습니다.."
-            ) from ex
+        data = self._buy_list_data(start_date, end_date, "", "1")
+        while True:
+            data["nowPage"] = str(now_page)
+            resp = await self.session.post(
+                f"{DH_LOTTERY_URL}/myPage.do?method=lottoBuyList",
+                data=data,
+            )
+            soup = await async_parse_html(await resp.text())
+            table = soup.find("table", {"class": "tbl_data_col"})
+            if not table or table.text == last_table:
+                return accum_prize
+            last_table = table.text
+
+            if table.find("td", {"class": "nodata"}):
+                return accum_prize
+
+            rows = [tr.select("td") for tr in table.select("tbody tr")]
+            won_rows = []
+            for tds in rows:
+                if tds[5].text.strip() != "당첨":
+                    break
+                won_rows.append(tds)
+            accum_prize += sum(
+                DhLotteryClient.parse_digit(tds[6].text.strip()) for tds in won_rows
+            )
+            if len(won_rows) < len(rows) or len(rows) < 10:
+                return accum_prize
+            now_page += 1
 
     @staticmethod
     def parse_digit(text) -> int:
         """문자열에서 숫자를 추출하여 정수로 변환합니다."""
-        numbers = "".join([c for c in text if c.isdigit()])
+        numbers = "".join(filter(str.isdigit, text))
         return int(numbers) if numbers else 0
@@ -1,17 +1,33 @@
+import asyncio
 import datetime
 import json
 import logging
 import re
-from dataclasses import dataclass, field
+import time
+from dataclasses import asdict, dataclass, field
 from enum import StrEnum
 from typing import List, Dict
 
-from bs4 import BeautifulSoup
+import orjson
 
-from .dh_lottery_client import DhLotteryClient, DH_LOTTERY_URL, DhLotteryError
+from .dh_lottery_client import (
+    DhLotteryClient,
+    DH_LOTTERY_URL,
+    DhLotteryError,
+    _wrap_errors,
+    async_parse_html,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+_DETAIL_POP_RE = re.compile(r"detailPop\('(\d+)', '(\d+)'")
+
+# 가장 긴 이름이 먼저 와야 "반자동"이 "자동"으로 잘못 매칭되지 않습니다.
+_SEL_MODE_TEXT_RE = re.compile(r"반자동|수동|자동")
+
+# 최신 회차 캐시 유지 시간 (초). 회차는 매주 토요일 추첨 후에만 바뀝니다.
+LATEST_ROUND_CACHE_TTL = 600.0
+
 
 class DhLotto645Error(DhLotteryError):
     """DH Lotto 645 예외 클래스입니다."""
@@ -27,50 +43,51 @@ class DhLotto645SelMode(StrEnum):
     @staticmethod
     def value_of(value: str) -> "DhLotto645SelMode":
         """로또 구매 모드 값을 가져옵니다."""
-        if value == "1":
-            return DhLotto645SelMode.MANUAL
-        if value == "2":
-            return DhLotto645SelMode.SEMI_AUTO
-        if value == "3":
-            return DhLotto645SelMode.AUTO
-        raise ValueError(f"Invalid value: {value}")
+        try:
+            return _SEL_MODE_BY_CODE[value]
+        except KeyError:
+            raise ValueError(f"Invalid value: {value}") from None
 
     def to_value(self) -> str:
         """로또 구매 모드 값을 가져옵니다."""
-        if self == DhLotto645SelMode.AUTO:
-            return "0"
-        if self == DhLotto645SelMode.MANUAL:
-            return "1"
-        if self == DhLotto645SelMode.SEMI_AUTO:
-            return "2"
-        raise ValueError(f"Invalid value: {self}")
+        return _SEL_MODE_TO_CODE[self]
 
     @staticmethod
     def value_of_text(text: str) -> "DhLotto645SelMode":
         """로또 구매 모드 값을 가져옵니다."""
-        if "반자동" in text:
-            return DhLotto645SelMode.SEMI_AUTO
-        if "자동" in text:
-            return DhLotto645SelMode.AUTO
-        if "수동" in text:
-            return DhLotto645SelMode.MANUAL
-        raise ValueError(f"Invalid text: {text}")
+        match = _SEL_MODE_TEXT_RE.search(text)
+        if not match:
+            raise ValueError(f"Invalid text: {text}")
+        return _SEL_MODE_BY_TEXT[match.group(0)]
 
     def __str__(self):
         """로또 구매 모드 값을 가져옵니다."""
-        if self == DhLotto645SelMode.AUTO:
-            return "자동"
-        if self == DhLotto645SelMode.MANUAL:
-            return "수동"
-        if self == DhLotto645SelMode.SEMI_AUTO:
-            return "반자동"
-        raise ValueError(f"Invalid value: {self}")
+        return self.value
+
+
+_SEL_MODE_BY_CODE = {
+    "1": DhLotto645SelMode.MANUAL,
+    "2": DhLotto645SelMode.SEMI_AUTO,
+    "3": DhLotto645SelMode.AUTO,
+}
+
+_SEL_MODE_TO_CODE = {
+    DhLotto645SelMode.AUTO: "0",
+    DhLotto645SelMode.MANUAL: "1",
+    DhLotto645SelMode.SEMI_AUTO: "2",
+}
+
+_SEL_MODE_BY_TEXT = {
+    "반자동": DhLotto645SelMode.SEMI_AUTO,
+    "자동": DhLotto645SelMode.AUTO,
+    "수동": DhLotto645SelMode.MANUAL,
+}
 
 
 class DhLotto645:
     """동행복권 로또 6/45를 구매하는 클래스입니다."""
 
-    @dataclass
+    @dataclass(slots=True)
     class WinningData:
         """로또 당첨 정보를 나타내는 데이터 클래스입니다."""
 
@@ -79,14 +96,16 @@ class DhLotto645:
         bonus_num: int
         draw_date: str
 
-    @dataclass
+    @dataclass(slots=True)
     class Slot:
         """로또 슬롯 정보를 나타내는 데이터 클래스입니다."""
 
         mode: DhLotto645SelMode = DhLotto645SelMode.AUTO
         numbers: List[int] = field(default_factory=lambda: [])
+        # 구매 파라미터용 "1,2,3" 형태 문자열. deduplicate_numbers에서 채워집니다.
+        _joined: str = ""
 
-    @dataclass(order=True)
+    @dataclass(order=True, slots=True)
     class Game:
         """로또 게임 정보를 나타내는 데이터 클래스입니다."""
 
@@ -94,7 +113,7 @@ class DhLotto645:
         mode: DhLotto645SelMode = DhLotto645SelMode.AUTO
         numbers: List[int] = field(default_factory=lambda: [])
 
-    @dataclass
+    @dataclass(slots=True)
     class BuyData:
         """로또 구매 결과를 나타내는 데이터 클래스입니다."""
 
@@ -109,10 +128,10 @@ class DhLotto645:
                 "round_no": self.round_no,
                 "barcode": self.barcode,
                 "issue_dt": self.issue_dt,
-                "games": [game.__dict__ for game in self.games],
+                "games": [asdict(game) for game in self.games],
             }
 
-    @dataclass
+    @dataclass(slots=True)
     class BuyHistoryData:
         """로또 구매 내역을 나타내는 데이터 클래스입니다."""
 
@@ -124,22 +143,28 @@ class DhLotto645:
     def __init__(self, client: DhLotteryClient):
         """DhLotto645 클래스를 초기화합니다."""
         self.client = client
+        self._latest_round_cache: tuple[float, int] | None = None
 
     async def async_get_latest_round_no(self) -> int:
         """최신 로또 회차 번호를 가져옵니다."""
+        cached = self._latest_round_cache
+        if cached and time.monotonic() - cached[0] < LATEST_ROUND_CACHE_TTL:
+            return cached[1]
         resp = await self.client.session.get(f"{DH_LOTTERY_URL}/common.do?method=main")
-        soup = BeautifulSoup(await resp.text(), "html5lib")
+        soup = await async_parse_html(await resp.text())
         drw_no = soup.find("strong", {"id": "lottoDrwNo"})
         if not drw_no:
             raise DhLotto645Error("최신 회차 정보를 가져올 수 없습니다.")
-        return int(drw_no.text)
+        round_no = int(drw_no.text)
+        self._latest_round_cache = (time.monotonic(), round_no)
+        return round_no
 
     async def async_get_winning_numbers(self, round_no: int) -> WinningData:
         """특정 회차의 로또 당첨 번호를 가져옵니다."""
         resp = await self.client.session.get(
             f"{DH_LOTTERY_URL}/common.do?method=getLottoNumber&drwNo={round_no}"
         )
-        res_json = await resp.json(content_type="text/html")
+        res_json = await resp.json(content_type="text/html", loads=orjson.loads)
         if res_json.get("returnValue") != "success":
             raise DhLotto645Error(f"당첨번호 조회에 실패했습니다. (회차: {round_no})")
 
@@ -166,12 +191,17 @@ class DhLotto645:
         "weekDay":"화","payLimitDate":null,"drawDate":null,"nBuyAmount":1000}}
         """
 
-        _LOGGER.debug(f"Buy Lotto, items: {items}")
+        _LOGGER.debug("Buy Lotto, items: %s", items)
 
         def deduplicate_numbers(_items: List["DhLotto645.Slot"]) -> None:
-            """구매 번호에서 중복을 제거합니다."""
+            """구매 번호에서 중복을 제거하고 파라미터 문자열을 미리 만들어 둡니다."""
             for _item in _items:
-                _item.numbers = list(set(_item.numbers))
+                # 자동 슬롯은 번호가 없습니다.
+                if _item.mode == DhLotto645SelMode.AUTO:
+                    continue
+                nums = sorted(set(_item.numbers))
+                _item.numbers = nums
+                _item._joined = ",".join(map(str, nums))
 
         async def _verify_and_get_buy_count(_items: List["DhLotto645.Slot"]) -> int:
             """구매 가능한지 검증하고, 구매 가능한 로또 개수를 반환합니다."""
@@ -224,14 +254,17 @@ class DhLotto645:
                         f"❗예치금이 부족합니다. (예치금: {_balance.purchase_available}원)"
                     )
                 _LOGGER.debug(
-                    f"Buy count: {_buy_count}, deposit: {_buy_count * 1000}/{_balance.purchase_available}원"
+                    "Buy count: %d, deposit: %d/%d원",
+                    _buy_count,
+                    _buy_count * 1000,
+                    _balance.purchase_available,
                 )
 
             _check_buy_time()
             _check_item_count()
             _this_week_buy_count = await _async_check_weekly_limit()
             _available_count = 5 - _this_week_buy_count
-            _LOGGER.debug(f"Available count: {_available_count}")
+            _LOGGER.debug("Available count: %d", _available_count)
 
             _balance = await self.client.async_get_balance()
             _buy_count = min(len(items), _available_count)
@@ -243,7 +276,8 @@ class DhLotto645:
             _resp = await self.client.session.post(
                 url="https://ol.dhlottery.co.kr/olotto/game/egovUserReadySocket.json"
             )
-            return json.loads(await _resp.text())["ready_ip"]
+            data = await _resp.json(content_type=None, loads=orjson.loads)
+            return data["ready_ip"]
 
         def make_param(tickets: List["DhLotto645.Slot"]) -> str:
             """로또 구매 정보를 생성합니다."""
@@ -257,9 +291,7 @@ class DhLotto645:
                             else t.mode
                         ).to_value(),
                         "arrGameChoiceNum": (
-                            None
-                            if t.mode == DhLotto645SelMode.AUTO
-                            else ",".join(map(str, sorted(t.numbers)))
+                            None if t.mode == DhLotto645SelMode.AUTO else t._joined
                         ),
                         "alpabet": "ABCDE"[i],
                     }
@@ -271,19 +303,24 @@ class DhLotto645:
             """구매 결과를 파싱합니다.
             example: ["A|01|02|04|27|39|443", "B|11|23|25|27|28|452"]
             """
+            games: List[DhLotto645.Game] = []
+            for _item in result["arrGameChoiceNum"]:
+                # 마지막 조각은 "433"처럼 번호와 모드 코드가 붙어 있습니다.
+                parts = _item.split("|")
+                games.append(
+                    DhLotto645.Game(
+                        slot=parts[0],
+                        mode=DhLotto645SelMode.value_of(parts[-1][-1]),
+                        numbers=[int(x) for x in parts[1:-1]]
+                        + [int(parts[-1][:-1])],
+                    )
+                )
             return DhLotto645.BuyData(
                 round_no=int(result["buyRound"]),
                 issue_dt=f'{result["issueDay"]} {result["weekDay"]} {result["issueTime"]}',
                 barcode=f'{result["barCode1"]} {result["barCode2"]} {result["barCode3"]} '
                 f'{result["barCode4"]} {result["barCode5"]} {result["barCode6"]}',
-                games=[
-                    DhLotto645.Game(
-                        slot=_item[0],
-                        mode=DhLotto645SelMode.value_of(_item[-1]),
-                        numbers=[int(x) for x in _item[2:-1].split("|")],
-                    )
-                    for _item in result["arrGameChoiceNum"]
-                ],
+                games=games,
             )
 
         try:
@@ -301,7 +338,7 @@ class DhLotto645:
                 },
                 timeout=10,
             )
-            response = await resp.json()
+            response = await resp.json(loads=orjson.loads)
             if response["result"]["resultCode"] != "100":
                 raise DhLotto645Error(
                     f"❗로또6/45 구매에 실패했습니다. (사유: {response['result']['resultMsg']})"
@@ -314,9 +351,9 @@ class DhLotto645:
                 f"❗로또6/45 구매에 실패했습니다. (사유: {str(ex)})"
             ) from ex
 
+    @_wrap_errors("❗최근 1주일간의 구매내역을 조회하지 못했습니다.")
     async def async_get_buy_history_this_week(self) -> list[BuyHistoryData]:
         """최근 1주일간의 구매 내역을 조회합니다."""
-        pattern = r"detailPop\('(\d+)', '(\d+)'"
 
         async def async_get_receipt(
             _order_no: str, _barcode: str
@@ -325,7 +362,7 @@ class DhLotto645:
             _resp = await self.client.session.get(
                 f"{DH_LOTTERY_URL}/myPage.do?method=lotto645Detail&orderNo={_order_no}&barcode={_barcode}&issueNo=1"
             )
-            _soup = BeautifulSoup(await _resp.text(), "html5lib")
+            _soup = await async_parse_html(await _resp.text())
             _slots: List[DhLotto645.Game] = []
             for li in _soup.select("div.selected ul li"):
                 title = li.select("strong span")
@@ -339,31 +376,38 @@ class DhLotto645:
                 )
             return _slots
 
-        try:
-            trs = await self.client.async_get_buy_list("LO40")
-            items: List[DhLotto645.BuyHistoryData] = []
-            for tr in trs:
-                receipt_link = tr.select("td")[3].select("a")
-                if not receipt_link:
-                    continue
-                href = receipt_link[0]["href"]
-                matches = re.search(pattern, href)
-                if not matches:
-                    continue
-                order_no = matches.group(1)
-                barcode = matches.group(2)
-                items.append(
-                    DhLotto645.BuyHistoryData(
-                        round_no=int(tr.select("td")[2].text.strip()),
-                        barcode=tr.select("td")[3].text.strip(),
-                        result=tr.select("td")[5].text.strip(),
-                        games=await async_get_receipt(order_no, barcode),
-                    )
+        trs = await self.client.async_get_buy_list("LO40")
+        rows = []
+        for tr in trs:
+            receipt_link = tr.select("td")[3].select("a")
+            if not receipt_link:
+                continue
+            href = receipt_link[0]["href"]
+            matches = _DETAIL_POP_RE.search(href)
+            if not matches:
+                continue
+            rows.append((tr.select("td"), matches.group(1), matches.group(2)))
+
+        # 영수증 조회는 서로 독립이므로 한꺼번에 요청합니다.
+        games_per_row = await asyncio.gather(
+            *(
+                async_get_receipt(order_no, barcode)
+                for _tds, order_no, barcode in rows
+            )
+        )
+
+        items: List[DhLotto645.BuyHistoryData] = []
+        game_count = 0
+        for (tds, _order_no, _barcode), games in zip(rows, games_per_row):
+            items.append(
+                DhLotto645.BuyHistoryData(
+                    round_no=int(tds[2].text.strip()),
+                    barcode=tds[3].text.strip(),
+                    result=tds[5].text.strip(),
+                    games=games,
                 )
-                if sum([len(item.games) for item in items]) >= 5:
-                    break
-            return items
-        except Exception as ex:
-            raise DhLotteryError(
-                "❗최근 1주일간의 구매내역을 조회하지 못했습니다."
-            ) from ex
+            )
+            game_count += len(games)
+            if game_count >= 5:
+                break
+        return items
@@ -8,7 +8,13 @@ import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
 from homeassistant.config_entries import ConfigFlow, ConfigFlowResult
 from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
-from .client.dh_lottery_client import DhLotteryClient, DhLotteryError
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from .client.dh_lottery_client import (
+    DhLotteryClient,
+    DhLotteryError,
+    DH_LOTTERY_HEADERS,
+)
 from .const import DOMAIN, TITLE, CONF_LOTTO_645
 
 _LOGGER = logging.getLogger(__name__)
@@ -22,11 +28,16 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
 )
 
 
-async def async_validate_login(username: str, password: str) -> dict[str, Any]:
+async def async_validate_login(
+    hass: HomeAssistant, username: str, password: str
+) -> dict[str, Any]:
     """사용자 입력을 검증하여 연결할 수 있는지 확인합니다.
     Data는 STEP_USER_DATA_SCHEMA로부터 키 값을 갖고 있습니다.
     """
-    client = DhLotteryClient(username, password)
+    session = async_create_clientsession(
+        hass, verify_ssl=False, headers=DH_LOTTERY_HEADERS
+    )
+    client = DhLotteryClient(username, password, session=session)
 
     errors = {}
     try:
@@ -57,7 +68,7 @@ class DhLotteryConfigFlow(ConfigFlow, domain=DOMAIN):
         username = user_input[CONF_USERNAME]
         password = user_input[CONF_PASSWORD]
 
-        if errors := await async_validate_login(username, password):
+        if errors := await async_validate_login(self.hass, username, password):
             return self.async_show_form(
                 step_id="user",
                 data_schema=STEP_USER_DATA_SCHEMA,
@@ -1,11 +1,14 @@
+import asyncio
 import datetime
 import logging
-from dataclasses import dataclass
+import time
+from dataclasses import asdict, dataclass
 from typing import Any, Optional, List, Callable, Awaitable
 
 import async_timeout
 
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from .client.dh_lottery_client import (
     DhLotteryError,
@@ -14,6 +17,7 @@ from .client.dh_lottery_client import (
 )
 from .client.dh_lotto_645 import DhLotto645
 from .const import (
+    DOMAIN,
     COORDINATOR_UPDATE_INTERVAL,
     LOTTO_645_UPDATE_INTERVAL,
     LOTTERY_ACCUMULATED_PRIZE_UPDATE_INTERVAL,
@@ -22,8 +26,19 @@ from .const import (
 
 _LOGGER = logging.getLogger(__name__)
 
+# 갱신 간격 비교는 NTP 보정에 영향을 받지 않도록 monotonic 초 단위로 수행합니다.
+_BALANCE_INTERVAL_SEC = LOTTERY_BALANCE_UPDATE_INTERVAL.total_seconds()
+_ACCUMULATED_PRIZE_INTERVAL_SEC = (
+    LOTTERY_ACCUMULATED_PRIZE_UPDATE_INTERVAL.total_seconds()
+)
+_BUY_HISTORY_INTERVAL_SEC = LOTTO_645_UPDATE_INTERVAL.total_seconds()
+
+# 로또 6/45 추첨 방송 시간대 (토요일)
+_DRAW_WINDOW_START = datetime.time(20, 40)
+_DRAW_WINDOW_END = datetime.time(21, 30)
+
 
-@dataclass(order=True)
+@dataclass(order=True, slots=True)
 class DhLotto645BuyData:
     """로또 구매 내역을 나타내는 데이터 클래스입니다."""
 
@@ -51,31 +66,39 @@ class DhLotteryCoordinator(DhCoordinator):
             update_interval=COORDINATOR_UPDATE_INTERVAL,
         )
         self.client = client
-        self._balance_last_updated: Optional[datetime.datetime] = None
-        self._accumulated_prize_last_updated: Optional[datetime.datetime] = None
+        self._balance_last_updated: Optional[float] = None
+        self._accumulated_prize_last_updated: Optional[float] = None
 
     async def _async_update_data(self) -> dict[str, Any]:
         """동행복권 데이터를 비동기로 업데이트합니다."""
         now = datetime.datetime.now()
+        mono = time.monotonic()
         try:
-            balance: Optional[DhLotteryBalanceData] = None
-            if self._check_update_balance(now):
+            # 서로 독립적인 조회이므로 하나의 타임아웃 안에서 동시에 수행합니다.
+            tasks: dict[str, Any] = {}
+            if self._check_update_balance(mono):
+                _LOGGER.info("예치금 정보를 업데이트합니다.")
+                tasks["balance"] = self.client.async_get_balance()
+            if self._check_update_accumulated_prize(mono):
+                _LOGGER.info("누적 당첨금을 업데이트 합니다.")
+                tasks["accumulated_prize"] = self.client.async_get_accumulated_prize()
+
+            results: dict[str, Any] = {}
+            if tasks:
                 async with async_timeout.timeout(10):
-                    _LOGGER.info("예치금 정보를 업데이트합니다.")
-                    balance = await self.client.async_get_balance()
-                    self._balance_last_updated = now
+                    results = dict(zip(tasks, await asyncio.gather(*tasks.values())))
 
-            accumulated_prize: Optional[int] = None
-            if self._check_update_accumulated_prize(now):
-                async with async_timeout.timeout(10):
-                    _LOGGER.info("누적 당첨금을 업데이트 합니다.")
-                    accumulated_prize = await self.client.async_get_accumulated_prize()
-                    self._accumulated_prize_last_updated = now
+            balance: Optional[DhLotteryBalanceData] = results.get("balance")
+            if balance is not None:
+                self._balance_last_updated = mono
+            accumulated_prize: Optional[int] = results.get("accumulated_prize")
+            if accumulated_prize is not None:
+                self._accumulated_prize_last_updated = mono
 
             return {
                 "balance": balance,
                 "accumulated_prize": accumulated_prize,
-                "update_dt": now.strftime("%Y-%m-%d %H:%M:%S"),
+                "update_dt": now.isoformat(sep=" ", timespec="seconds"),
             }
         # except DhLotteryLoginError as err:
         # Raising ConfigEntryAuthFailed will cancel future updates
@@ -86,23 +109,24 @@ class DhLotteryCoordinator(DhCoordinator):
 
     async def async_clear_refresh(self):
         """데이터를 새로고침합니다."""
+        self.client.clear_cache()
         self._balance_last_updated = None
         self._accumulated_prize_last_updated = None
         await self.async_request_refresh()
 
-    def _check_update_balance(self, now: datetime.datetime) -> bool:
+    def _check_update_balance(self, mono: float) -> bool:
         """예치금 정보를 업데이트할지 확인합니다."""
-        if not self._balance_last_updated:
+        if self._balance_last_updated is None:
             return True
-        return (now - self._balance_last_updated) >= LOTTERY_BALANCE_UPDATE_INTERVAL
+        return (mono - self._balance_last_updated) >= _BALANCE_INTERVAL_SEC
 
-    def _check_update_accumulated_prize(self, now: datetime.datetime) -> bool:
+    def _check_update_accumulated_prize(self, mono: float) -> bool:
         """누적 당첨금을 업데이트할지 확인합니다."""
-        if not self._accumulated_prize_last_updated:
+        if self._accumulated_prize_last_updated is None:
             return True
         return (
-            now - self._accumulated_prize_last_updated
-        ) >= LOTTERY_ACCUMULATED_PRIZE_UPDATE_INTERVAL
+            mono - self._accumulated_prize_last_updated
+        ) >= _ACCUMULATED_PRIZE_INTERVAL_SEC
 
 
 class DhLotto645Coordinator(DhCoordinator):
@@ -124,12 +148,17 @@ class DhLotto645Coordinator(DhCoordinator):
         self.lotto_645 = DhLotto645(client)
         self.lottery_refresh_func = lottery_refresh_func
         self._latest_winning_numbers: Optional[DhLotto645.WinningData] = None
-        self._buy_history_last_updated: Optional[datetime.datetime] = None
+        self._buy_history_last_updated: Optional[float] = None
         self.winning_dict: dict[int, DhLotto645.WinningData] = {}
+        # 한 번 추첨된 회차의 당첨 번호는 불변이므로 재시작 후에도 재사용합니다.
+        self._store: Store = Store(hass, 1, f"{DOMAIN}.winning_{client.username}")
+        self._store_loaded = False
 
     async def _async_update_data(self) -> dict[str, Any]:
         """Lotto 6/45 데이터를 비동기로 업데이트합니다."""
+        await self._async_load_winning_dict()
         now = datetime.datetime.now()
+        mono = time.monotonic()
         try:
             latest_winning_numbers: Optional[DhLotto645.WinningData] = None
 
@@ -142,23 +171,23 @@ class DhLotto645Coordinator(DhCoordinator):
                     )
                     self._latest_winning_numbers = latest_winning_numbers
                     # 최신 회차를 업데이트 할 때, 구매 내역, 예치금, 누적 당첨금이 같이 업데이트 되도록 함
-                    if self._buy_history_last_updated:
+                    if self._buy_history_last_updated is not None:
                         await self.lottery_refresh_func()
                     self._buy_history_last_updated = None
 
             buy_history_this_week: List[DhLotto645BuyData] = []
-            if self._async_check_update_buy_history(now):
+            if self._async_check_update_buy_history(mono):
                 async with async_timeout.timeout(10):
                     _LOGGER.info("이번 주의 구매 내역을 업데이트합니다.")
                     buy_history_this_week = (
                         await self._async_get_buy_history_this_week()
                     )
-                    self._buy_history_last_updated = now
+                    self._buy_history_last_updated = mono
 
             return {
                 "latest_winning_numbers": latest_winning_numbers,
                 "buy_history_this_week": buy_history_this_week,
-                "update_dt": now.strftime("%Y-%m-%d %H:%M:%S"),
+                "update_dt": now.isoformat(sep=" ", timespec="seconds"),
             }
         # except DhLotteryLoginError as err:
         # Raising ConfigEntryAuthFailed will cancel future updates
@@ -169,6 +198,7 @@ class DhLotto645Coordinator(DhCoordinator):
 
     async def async_clear_refresh(self):
         """데이터를 새로고침합니다."""
+        self.client.clear_cache()
         self._latest_winning_numbers = None
         self._buy_history_last_updated = None
         self.winning_dict = {}
@@ -179,18 +209,16 @@ class DhLotto645Coordinator(DhCoordinator):
         if not self._latest_winning_numbers:
             return True
         # 현재 시각이 토요일 20:40 ~ 21:30 사이인지 확인합니다.
-        if now.weekday() == 5 and datetime.time(20, 40) <= now.time() <= datetime.time(
-            21, 30
-        ):
-            if now.strftime("%Y-%m-%d") != self._latest_winning_numbers.draw_date:
+        if now.weekday() == 5 and _DRAW_WINDOW_START <= now.time() <= _DRAW_WINDOW_END:
+            if now.date().isoformat() != self._latest_winning_numbers.draw_date:
                 return True
         return False
 
-    def _async_check_update_buy_history(self, now: datetime.datetime) -> bool:
+    def _async_check_update_buy_history(self, mono: float) -> bool:
         """구매 내역을 업데이트할지 확인합니다."""
-        if not self._buy_history_last_updated:
+        if self._buy_history_last_updated is None:
             return True
-        return (now - self._buy_history_last_updated) >= LOTTO_645_UPDATE_INTERVAL
+        return (mono - self._buy_history_last_updated) >= _BUY_HISTORY_INTERVAL_SEC
 
     async def _async_get_buy_history_this_week(self) -> List[DhLotto645BuyData]:
         """이번 주의 구매 내역을 가져옵니다."""
@@ -199,15 +227,12 @@ class DhLotto645Coordinator(DhCoordinator):
             my_numbers: List[int], win_numbers: List[int], bonus: int
         ) -> int:
             """로또 등수를 계산합니다."""
-            same_cnt = 0  # 일치하는 개수
-
-            for num in win_numbers:  # 각 당첨 번호 포함 여부 체크
-                if num in my_numbers:
-                    same_cnt += 1
+            my_set = frozenset(my_numbers)
+            same_cnt = len(my_set & frozenset(win_numbers))  # 일치하는 개수
             # 등수 반환
             if same_cnt == 6:
                 return 1
-            if same_cnt == 5 and bonus in my_numbers:
+            if same_cnt == 5 and bonus in my_set:
                 return 2
             if same_cnt == 5:
                 return 3
@@ -215,29 +240,42 @@ class DhLotto645Coordinator(DhCoordinator):
                 return 4
             if same_cnt == 3:
                 return 5
-            else:
-                return 0  # 꽝
+            return 0  # 꽝
 
-        async def async_get_rank(_result: str, _numbers: List[int]) -> int:
-            """등수를 비동기로 가져옵니다."""
+        def get_rank(_result: str, _numbers: List[int], _round_no: int) -> int:
+            """미리 받아 둔 당첨 번호로 등수를 계산합니다."""
             if _result == "미추첨":
                 return -1
             if "당첨" in _result:
-                winning_numbers = await self._async_get_winning_numbers(item.round_no)
+                winning_numbers = self.winning_dict[_round_no]
                 return calculate_rank(
                     _numbers, winning_numbers.numbers, winning_numbers.bonus_num
                 )
             return 0
 
+        history = await self.lotto_645.async_get_buy_history_this_week()
+
+        # 같은 회차의 게임이 여러 개여도 당첨 번호는 회차마다 한 번만 조회하며,
+        # 아직 없는 회차는 동시에 가져옵니다.
+        needed_rounds = {item.round_no for item in history if "당첨" in item.result}
+        missing_rounds = needed_rounds - self.winning_dict.keys()
+        if missing_rounds:
+            await asyncio.gather(
+                *(
+                    self._async_get_winning_numbers(round_no)
+                    for round_no in missing_rounds
+                )
+            )
+
         items: List[DhLotto645BuyData] = []
-        for item in await self.lotto_645.async_get_buy_history_this_week():
+        for item in history:
             for game in item.games:
                 items.append(
                     DhLotto645BuyData(
                         round_no=item.round_no,
                         barcode=item.barcode,
                         game=game,
-                        rank=await async_get_rank(item.result, game.numbers),
+                        rank=get_rank(item.result, game.numbers, item.round_no),
                         result=item.result,
                     )
                 )
@@ -245,10 +283,28 @@ class DhLotto645Coordinator(DhCoordinator):
                     break
         return items
 
+    async def _async_load_winning_dict(self) -> None:
+        """저장소에서 과거 회차의 당첨 번호를 불러옵니다. 최초 1회만 수행합니다."""
+        if self._store_loaded:
+            return
+        self._store_loaded = True
+        stored = await self._store.async_load()
+        if stored:
+            self.winning_dict = {
+                int(round_no): DhLotto645.WinningData(**data)
+                for round_no, data in stored.items()
+            }
+
     async def _async_get_winning_numbers(self, round_no: int):
         """당첨 번호를 비동기로 가져옵니다."""
         winning_data = self.winning_dict.get(round_no)
         if not winning_data:
             winning_data = await self.lotto_645.async_get_winning_numbers(round_no)
             self.winning_dict[round_no] = winning_data
+            self._store.async_delay_save(
+                lambda: {
+                    str(no): asdict(data) for no, data in self.winning_dict.items()
+                },
+                60,
+            )
         return winning_data